@@ -233,6 +233,14 @@ digital_inputs:
         type: boolean
         required: no
         default: no
+      qos:
+        type: integer
+        required: no
+        default: 0
+        allowed:
+          - 0
+          - 1
+          - 2
 
 digital_outputs:
   type: list
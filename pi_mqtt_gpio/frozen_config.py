@@ -0,0 +1,230 @@
+"""
+Immutable versions of the validated config, with the values derived from it
+worked out once at startup, so they don't have to be looked up or computed
+again while handling messages.
+"""
+
+import ssl
+from collections import namedtuple
+from hashlib import sha1
+
+
+TOPIC_PREFIX_DIGESTS = {}  # storage for sha1 digests of topic prefixes
+
+
+def topic_prefix_digest(topic_prefix):
+    """
+    Return the SHA1 hex digest of the topic prefix, from which the default MQTT
+    client ID and the HomeAssistant device ID are derived. The digest is only
+    computed once for each prefix.
+    :param topic_prefix: Prefix of our topics
+    :type topic_prefix: str
+    :return: Hex digest of the topic prefix
+    :rtype: str
+    """
+    try:
+        return TOPIC_PREFIX_DIGESTS[topic_prefix]
+    except KeyError:
+        digest = sha1(topic_prefix.encode("utf8")).hexdigest()
+        TOPIC_PREFIX_DIGESTS[topic_prefix] = digest
+        return digest
+
+
+def tls_kwargs_from_config(tls_config):
+    """
+    Convert the TLS section of the MQTT config to arguments for tls_set().
+    :param tls_config: Validated config dict containing TLS options
+    :type tls_config: dict
+    :return: Keyword arguments for paho.mqtt.client.Client.tls_set()
+    :rtype: dict
+    """
+    tls_kwargs = dict(
+        ca_certs=tls_config.get("ca_certs"),
+        certfile=tls_config.get("certfile"),
+        keyfile=tls_config.get("keyfile"),
+        ciphers=tls_config.get("ciphers"),
+    )
+    try:
+        tls_kwargs["cert_reqs"] = getattr(ssl, tls_config["cert_reqs"])
+    except KeyError:
+        pass
+    try:
+        tls_kwargs["tls_version"] = getattr(ssl, tls_config["tls_version"])
+    except KeyError:
+        pass
+    return tls_kwargs
+
+
+class MqttConfig(
+    namedtuple(
+        "MqttConfig",
+        (
+            "host",
+            "port",
+            "user",
+            "password",
+            "client_id",
+            "topic_prefix",
+            "protocol",
+            "status_topic",
+            "status_payload_running",
+            "status_payload_stopped",
+            "status_payload_dead",
+            "discovery",
+            "discovery_prefix",
+            "discovery_name",
+            "tls_kwargs",
+            "tls_insecure",
+        ),
+    )
+):
+    """
+    The MQTT section of the config, with everything derived from it worked out
+    up front: the client ID, the full status topic and the TLS arguments.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create from the validated and normalised MQTT section of the config.
+        :param config: Validated config dict containing MQTT connection details
+        :type config: dict
+        :return: The MQTT config
+        :rtype: MqttConfig
+        """
+        topic_prefix = config["topic_prefix"]
+        # https://stackoverflow.com/questions/45774538/what-is-the-maximum-length-of-client-id-in-mqtt
+        # TLDR: Soft limit of 23, but we needn't truncate it on our end.
+        client_id = config["client_id"]
+        if not client_id:
+            client_id = "pi-mqtt-gpio-%s" % topic_prefix_digest(topic_prefix)
+        tls_config = config.get("tls", {})
+        tls_enabled = tls_config.get("enabled")
+        return cls(
+            host=config["host"],
+            port=config["port"],
+            user=config["user"],
+            password=config["password"],
+            client_id=client_id,
+            topic_prefix=topic_prefix,
+            protocol=config["protocol"],
+            status_topic="%s/%s" % (topic_prefix, config["status_topic"]),
+            status_payload_running=config["status_payload_running"],
+            status_payload_stopped=config["status_payload_stopped"],
+            status_payload_dead=config["status_payload_dead"],
+            discovery=config["discovery"],
+            discovery_prefix=config["discovery_prefix"],
+            discovery_name=config["discovery_name"],
+            tls_kwargs=tls_kwargs_from_config(tls_config) if tls_enabled else None,
+            tls_insecure=tls_config.get("insecure", False),
+        )
+
+
+class DigitalInput(
+    namedtuple(
+        "DigitalInput",
+        (
+            "name",
+            "module",
+            "gpio",
+            "pin",
+            "inverted",
+            "on_payload",
+            "off_payload",
+            "retain",
+            "qos",
+            "state_topic",
+        ),
+    )
+):
+    """
+    The parts of a digital input's config which are used while polling it,
+    with the GPIO module resolved. Fields are read as attributes, which is
+    cheaper than looking them up in the config dict every time.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_config(cls, in_conf, gpio):
+        """
+        Create from a validated and normalised digital input config.
+        :param in_conf: Input config
+        :type in_conf: dict
+        :param gpio: Instance of GenericGPIO the input is on
+        :type gpio: pi_mqtt_gpio.modules.GenericGPIO
+        :return: The digital input
+        :rtype: DigitalInput
+        """
+        return cls(
+            name=in_conf["name"],
+            module=in_conf["module"],
+            gpio=gpio,
+            pin=in_conf["pin"],
+            inverted=in_conf["inverted"],
+            on_payload=in_conf["on_payload"],
+            off_payload=in_conf["off_payload"],
+            retain=in_conf["retain"],
+            qos=in_conf["qos"],
+            state_topic=in_conf["state_topic"],
+        )
+
+
+class DigitalOutput(
+    namedtuple(
+        "DigitalOutput",
+        (
+            "name",
+            "module",
+            "gpio",
+            "pin",
+            "inverted",
+            "on_payload",
+            "off_payload",
+            "on_payload_bytes",
+            "off_payload_bytes",
+            "timed_set_ms",
+            "retain",
+            "state_topic",
+        ),
+    )
+):
+    """
+    The parts of a digital output's config which are used when setting it,
+    with the GPIO module resolved and the on/off payloads encoded, so that
+    received messages can be compared with them without being decoded.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_config(cls, out_conf, gpio):
+        """
+        Create from a validated and normalised digital output config.
+        :param out_conf: Output config
+        :type out_conf: dict
+        :param gpio: Instance of GenericGPIO the output is on
+        :type gpio: pi_mqtt_gpio.modules.GenericGPIO
+        :return: The digital output
+        :rtype: DigitalOutput
+        """
+        on_payload = out_conf.get("on_payload")
+        off_payload = out_conf.get("off_payload")
+        return cls(
+            name=out_conf["name"],
+            module=out_conf["module"],
+            gpio=gpio,
+            pin=out_conf["pin"],
+            inverted=out_conf["inverted"],
+            on_payload=on_payload,
+            off_payload=off_payload,
+            on_payload_bytes=None if on_payload is None else on_payload.encode("utf8"),
+            off_payload_bytes=(
+                None if off_payload is None else off_payload.encode("utf8")
+            ),
+            timed_set_ms=out_conf.get("timed_set_ms"),
+            retain=out_conf["retain"],
+            state_topic=out_conf["state_topic"],
+        )
@@ -53,6 +53,15 @@ class GenericGPIO(object):
     def get_pin(self, pin):
         pass
 
+    # may be overloaded, if module can read several pins at once
+    def get_pins(self, pins):
+        """
+        Read several pins and return their values in the same order. Modules
+        which can read a whole port in one bus transaction should override
+        this, as the pins being polled on a module are all read through it.
+        """
+        return [self.get_pin(pin) for pin in pins]
+
     def interrupt_callback(self, pin):
         """
         This function should not be overloaded, but be registered in the ISR
@@ -1,10 +1,26 @@
+import heapq
+import threading
 from functools import partial
+from itertools import count
 from time import time
 
+COMPACT_MIN_SIZE = 64
+
 
 class Scheduler:
     def __init__(self):
+        # Heap of (run_after, sequence, task) tuples, so that the next task due
+        # to run is always first. The sequence number keeps tasks with equal
+        # run_after values in the order they were added.
         self.tasks = []
+        self.sequence = count()
+        # Cancelled tasks stay on the heap until they're due, so it's compacted
+        # whenever it grows to this size.
+        self.compact_size = COMPACT_MIN_SIZE
+        # Tasks are added from the MQTT client's thread and run from the main
+        # thread, so access to the heap must be serialised.
+        self.lock = threading.Lock()
+        self.task_added = threading.Event()
 
     def loop(self):
         """
@@ -12,12 +28,17 @@ class Scheduler:
         :return: None
         :rtype: NoneType
         """
-        tasks_run = []
-        for task in filter(lambda t: t.should_run(), self.tasks):
-            task.run()
-            tasks_run.append(task)
-        for task in tasks_run:
-            self.tasks.remove(task)
+        now = time()
+        while True:
+            with self.lock:
+                if not self.tasks or self.tasks[0][0] > now:
+                    return
+                _, _, task = heapq.heappop(self.tasks)
+            # Hold the task's lock while running it, so that once cancel() has
+            # returned the task is either finished or will never run.
+            with task.lock:
+                if not task.cancelled:
+                    task.run()
 
     def add_task(self, task):
         """
@@ -27,7 +48,28 @@ class Scheduler:
         :return: None
         :rtype: NoneType
         """
-        self.tasks.append(task)
+        with self.lock:
+            heapq.heappush(self.tasks, (task.run_after, next(self.sequence), task))
+            if len(self.tasks) >= self.compact_size:
+                self.tasks = [entry for entry in self.tasks if not entry[2].cancelled]
+                heapq.heapify(self.tasks)
+                self.compact_size = max(COMPACT_MIN_SIZE, 2 * len(self.tasks))
+            self.task_added.set()
+
+    def wait(self, timeout):
+        """
+        Block until the next task is due to run, a task is added or the timeout
+        expires, whichever comes first.
+        :param timeout: Maximum number of seconds to wait for
+        :type timeout: float
+        :return: None
+        :rtype: NoneType
+        """
+        with self.lock:
+            if self.tasks:
+                timeout = min(timeout, max(0, self.tasks[0][0] - time()))
+            self.task_added.clear()
+        self.task_added.wait(timeout)
 
 
 class Task:
@@ -41,6 +83,8 @@ class Task:
         """
         self.run_after = run_after
         self.function = partial(function, *args, **kwargs)
+        self.cancelled = False
+        self.lock = threading.Lock()
 
     def should_run(self):
         """
@@ -50,6 +94,16 @@ class Task:
         """
         return time() >= self.run_after
 
+    def cancel(self):
+        """
+        Stops the task from being run. If the scheduler is running the task,
+        waits for it to finish.
+        :return: None
+        :rtype: NoneType
+        """
+        with self.lock:
+            self.cancelled = True
+
     def run(self):
         """
         Runs the task.
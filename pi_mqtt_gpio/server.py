@@ -5,19 +5,24 @@ import logging.config
 import yaml
 import sys
 import socket
-import ssl
+from collections import deque, OrderedDict
 from time import sleep, time
 from importlib import import_module
-from hashlib import sha1
 
 import threading  # For callback functions
 from fractions import gcd  # for calculating the callback periodic time
-from functools import reduce
+from functools import partial, reduce
 
 import paho.mqtt.client as mqtt
 import cerberus
 
 from pi_mqtt_gpio import CONFIG_SCHEMA
+from pi_mqtt_gpio.frozen_config import (
+    DigitalInput,
+    DigitalOutput,
+    MqttConfig,
+    topic_prefix_digest,
+)
 from pi_mqtt_gpio.modules import PinPullup, PinDirection, InterruptEdge, BASE_SCHEMA
 from pi_mqtt_gpio.scheduler import Scheduler, Task
 
@@ -31,6 +36,8 @@ LOG_LEVEL_MAP = {
 }
 
 RECONNECT_DELAY_SECS = 5
+POLL_INTERVAL_SECS = 0.01
+IDLE_INTERVAL_SECS = 1
 GPIO_MODULES = {}  # storage for gpio modules
 SENSOR_MODULES = {}  # storage for sensor modules
 STREAM_MODULES = {}  # storage for stream modules
@@ -40,7 +47,12 @@ STREAM_CONFIGS = {}  # storage for streams
 SENSOR_INPUT_CONFIGS = {}  # storage for sensor input configs
 STREAM_READ_CONFIGS = {}  # storage for streams read configs
 STREAM_WRITE_CONFIGS = {}  # storage for streams write configs
+DIGITAL_OUTPUTS = {}  # storage for digital outputs by name
+OUTPUT_QUEUES = {}  # storage for pending output writes per gpio module
+PENDING_REVERTS = {}  # storage for the scheduled revert of each output
 LAST_STATES = {}
+OUTPUT_TOPIC_CACHE = OrderedDict()  # topic -> result of parse_output_topic()
+OUTPUT_TOPIC_CACHE_SIZE = 4096
 GPIO_INTERRUPT_LOOKUP = {}
 SET_TOPIC = "set"
 SET_ON_MS_TOPIC = "set_on_ms"
@@ -95,6 +107,47 @@ class ConfigValidator(cerberus.Validator):
         return str(value)
 
 
+class OutputQueue(object):
+    """
+    Queue of pending writes for the outputs of one gpio module.
+    There's only ever one thread taking writes off the queue, so a deque and an
+    Event are enough, instead of the locking a Queue does for every item.
+    """
+
+    def __init__(self):
+        self.writes = deque()
+        self.ready = threading.Event()
+
+    def put(self, write):
+        """
+        Add a write to the queue. May be called from any thread.
+        :param write: Tuple of (output, value)
+        :type write: tuple
+        :return: None
+        :rtype: NoneType
+        """
+        self.writes.append(write)
+        self.ready.set()
+
+    def get_all(self):
+        """
+        Wait for writes to be queued, then remove and return all of them.
+        Must only be called from the one thread consuming the queue.
+        :return: List of writes in the order they were added
+        :rtype: list
+        """
+        while True:
+            # Clear before checking, so a write added in between still wakes us
+            self.ready.clear()
+            if self.writes:
+                break
+            self.ready.wait()
+        pending = []
+        while self.writes:
+            pending.append(self.writes.popleft())
+        return pending
+
+
 def on_log(client, userdata, level, buf):
     """
     Called when MQTT client wishes to log something.
@@ -105,7 +158,28 @@ def on_log(client, userdata, level, buf):
     :return: None
     :rtype: NoneType
     """
-    _LOG.log(LOG_LEVEL_MAP[level], "MQTT client: %s" % buf)
+    log_level = LOG_LEVEL_MAP[level]
+    if _LOG.isEnabledFor(log_level):
+        _LOG.log(log_level, "MQTT client: %s", buf)
+
+
+def set_tcp_nodelay(client):
+    """
+    Disables Nagle's algorithm on the MQTT client's socket so that small
+    messages, such as pin state changes, are sent straight away instead of
+    being held back until the previous packet has been acknowledged.
+    :param client: Connected MQTT client instance
+    :type client: paho.mqtt.client.Client
+    :return: None
+    :rtype: NoneType
+    """
+    sock = client.socket()
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except (socket.error, AttributeError) as err:
+        _LOG.warning("Unable to set TCP_NODELAY on the MQTT socket: %s", err)
 
 
 def output_by_name(output_name):
@@ -114,12 +188,12 @@ def output_by_name(output_name):
     :param output_name: The name of the output
     :type output_name: str
     :return: The output configuration or None if not found
-    :rtype: dict
+    :rtype: DigitalOutput
     """
-    for output in digital_outputs:
-        if output["name"] == output_name:
-            return output
-    _LOG.warning("No output found with name of %r", output_name)
+    try:
+        return DIGITAL_OUTPUTS[output_name]
+    except KeyError:
+        _LOG.warning("No output found with name of %r", output_name)
 
 
 def stream_write_by_name(name):
@@ -136,31 +210,41 @@ def stream_write_by_name(name):
     _LOG.warning("No write found with name of %r", name)
 
 
-def set_pin(topic_prefix, output_config, value):
+def set_pin(output_config, value):
+    """
+    Queues the output pin to be set to a new value and published on MQTT.
+    :param output_config: The output configuration
+    :type output_config: DigitalOutput
+    :param value: The new value to set it to
+    :type value: bool
+    :return: None
+    :rtype: NoneType
+    """
+    OUTPUT_QUEUES[output_config.module].put((output_config, value))
+
+
+def write_output(output_config, value):
     """
     Sets the output pin to a new value and publishes it on MQTT.
-    :param topic_prefix: the name of the topic, the pin is published
-    :type topic_prefix: string
     :param output_config: The output configuration
-    :type output_config: dict
+    :type output_config: DigitalOutput
     :param value: The new value to set it to
     :type value: bool
     :return: None
     :rtype: NoneType
     """
-    gpio = GPIO_MODULES[output_config["module"]]
-    set_value = not value if output_config["inverted"] else value
-    gpio.set_pin(output_config["pin"], set_value)
+    set_value = not value if output_config.inverted else value
+    output_config.gpio.set_pin(output_config.pin, set_value)
     _LOG.info(
         "Set %r output %r to %r",
-        output_config["module"],
-        output_config["name"],
+        output_config.module,
+        output_config.name,
         set_value,
     )
-    payload = output_config["on_payload" if value else "off_payload"]
+    payload = output_config.on_payload if value else output_config.off_payload
     client.publish(
-        "%s/%s/%s" % (topic_prefix, OUTPUT_TOPIC, output_config["name"]),
-        retain=output_config["retain"],
+        output_config.state_topic,
+        retain=output_config.retain,
         payload=payload,
     )
 
@@ -187,69 +271,127 @@ def stream_write_output(topic_prefix, stream_write_config, data):
     )
 
 
-def get_pin(in_conf, module):
+def group_inputs_by_module(inputs):
     """
-    Gets a pin using a GPIO module. Inverts the state if set in config."
-    :param in_conf: The input config
-    :type in_conf: dict
-    :param module: The GPIO module
-    :type module: modules.GenericGPIO
-    :return: The value of the pin, inverted if desired
-    :rtype: bool
+    Groups inputs by the GPIO module they're on, so that each module's pins can
+    be read in one go.
+    :param inputs: List of inputs
+    :type inputs: list
+    :return: The inputs in the order get_pins() returns their states, and a
+        list of (GPIO module, inputs, pins) tuples, in order of appearance
+    :rtype: tuple
+    """
+    groups = OrderedDict()
+    for in_conf in inputs:
+        groups.setdefault(in_conf.module, (in_conf.gpio, [], []))
+        _, module_inputs, pins = groups[in_conf.module]
+        module_inputs.append(in_conf)
+        pins.append(in_conf.pin)
+    input_groups = list(groups.values())
+    return [in_conf for _, group, _ in input_groups for in_conf in group], input_groups
+
+
+def get_pins(input_groups):
+    """
+    Gets the pins of each group using a single call to its GPIO module.
+    Inverts the states if set in config.
+    :param input_groups: List of tuples as returned by group_inputs_by_module()
+    :type input_groups: list
+    :return: The values of the pins, inverted if desired, in order of the groups
+    :rtype: list
+    """
+    states = []
+    for gpio, inputs, pins in input_groups:
+        for in_conf, value in zip(inputs, gpio.get_pins(pins)):
+            states.append(bool(value) != in_conf.inverted)
+    return states
+
+
+def schedule_revert(output_config, value, ms):
+    """
+    Schedules the output to be set back to a value after a number of ms.
+    Only the latest revert of each output is kept, so that an earlier timed
+    set can't cut a later one short.
+    :param output_config: The output configuration
+    :type output_config: DigitalOutput
+    :param value: The value to set the output back to
+    :type value: bool
+    :param ms: Number of milliseconds after which to set the output
+    :type ms: int
+    :return: None
+    :rtype: NoneType
     """
-    state = bool(module.get_pin(in_conf["pin"]))
-    return state != in_conf["inverted"]
+    cancel_revert(output_config)
+    task = Task(time() + ms / 1000.0, set_pin, output_config, value)
+    PENDING_REVERTS[output_config.name] = task
+    scheduler.add_task(task)
+    _LOG.info(
+        "Scheduled output %r to change back to %r after %r ms.",
+        output_config.name,
+        value,
+        ms,
+    )
 
 
-def handle_set(topic_prefix, msg):
+def cancel_revert(output_config):
+    """
+    Cancels the scheduled revert of the output, if there is one. Once this has
+    returned, the revert has either been queued already or never will be.
+    :param output_config: The output configuration
+    :type output_config: DigitalOutput
+    :return: None
+    :rtype: NoneType
+    """
+    task = PENDING_REVERTS.pop(output_config.name, None)
+    if task is not None:
+        task.cancel()
+
+
+def handle_set(topic_prefix, msg, output_name):
     """
     Handles an incoming 'set' MQTT message.
     :param topic_prefix: the name of the topic, the pin is published
     :type topic_prefix: string
     :param msg: The incoming MQTT message
     :type msg: paho.mqtt.client.MQTTMessage
+    :param output_name: The name of the output the message is setting
+    :type output_name: str
     :return: None
     :rtype: NoneType
     """
-    output_name = output_name_from_topic(msg.topic, topic_prefix, SET_TOPIC)
     output_config = output_by_name(output_name)
     if output_config is None:
         return
-    payload = msg.payload.decode("utf8")
-    if payload not in (output_config["on_payload"], output_config["off_payload"]):
+    payload = msg.payload
+    on_payload = output_config.on_payload_bytes
+    if payload != on_payload and payload != output_config.off_payload_bytes:
         _LOG.warning(
             "Payload %r does not relate to configured on/off values %r and %r",
-            payload,
-            output_config["on_payload"],
-            output_config["off_payload"],
+            payload.decode("utf8", "replace"),
+            output_config.on_payload,
+            output_config.off_payload,
         )
         return
 
-    value = payload == output_config["on_payload"]
-    set_pin(topic_prefix, output_config, value)
+    value = payload == on_payload
+    # Cancel first, so that a pending revert can't be queued after this write
+    cancel_revert(output_config)
+    set_pin(output_config, value)
 
-    try:
-        ms = output_config["timed_set_ms"]
-    except KeyError:
+    if output_config.timed_set_ms is None:
         return
-    scheduler.add_task(
-        Task(time() + ms / 1000.0, set_pin, topic_prefix, output_config, not value)
-    )
-    _LOG.info(
-        "Scheduled output %r to change back to %r after %r ms.",
-        output_config["name"],
-        not value,
-        ms,
-    )
+    schedule_revert(output_config, not value, output_config.timed_set_ms)
 
 
-def handle_set_ms(topic_prefix, msg, value):
+def handle_set_ms(topic_prefix, msg, output_name, value):
     """
     Handles an incoming 'set_<on/off>_ms' MQTT message.
     :param topic_prefix: the name of the topic
     :type topic_prefix: string
     :param msg: The incoming MQTT message
     :type msg: paho.mqtt.client.MQTTMessage
+    :param output_name: The name of the output the message is setting
+    :type output_name: str
     :param value: The value to set the output to
     :type value: bool
     :return: None
@@ -259,22 +401,21 @@ def handle_set_ms(topic_prefix, msg, value):
         ms = int(msg.payload)
     except ValueError:
         raise InvalidPayload("Could not parse ms value %r to an integer." % msg.payload)
-    suffix = SET_ON_MS_TOPIC if value else SET_OFF_MS_TOPIC
-    output_name = output_name_from_topic(msg.topic, topic_prefix, suffix)
     output_config = output_by_name(output_name)
     if output_config is None:
         return
 
-    set_pin(topic_prefix, output_config, value)
-    scheduler.add_task(
-        Task(time() + ms / 1000.0, set_pin, topic_prefix, output_config, not value)
-    )
-    _LOG.info(
-        "Scheduled output %r to change back to %r after %r ms.",
-        output_config["name"],
-        not value,
-        ms,
-    )
+    cancel_revert(output_config)
+    set_pin(output_config, value)
+    schedule_revert(output_config, not value, ms)
+
+
+# Maps the last level of an output topic to the function which handles it
+OUTPUT_TOPIC_HANDLERS = {
+    SET_TOPIC: handle_set,
+    SET_ON_MS_TOPIC: partial(handle_set_ms, value=True),
+    SET_OFF_MS_TOPIC: partial(handle_set_ms, value=False),
+}
 
 
 def handle_raw(topic_prefix, msg):
@@ -348,23 +489,52 @@ def type_from_topic(topic, topic_prefix):
     return fields[0]
 
 
-def output_name_from_topic(topic, topic_prefix, suffix):
+def parse_output_topic(topic, topic_prefix):
     """
-    Return the name of the output which the topic is setting.
+    Split an output topic into the name of the output and the action suffix.
+    The topic is only scanned once, and no regular expressions are involved.
     :param topic: String such as 'mytopicprefix/output/tv_lamp/set'
     :type topic: str
-    :param topic_prefix: Prefix of our topicsclient,
+    :param topic_prefix: Prefix of our topics
     :type topic_prefix: str
-    :param suffix: The suffix of the topic such as "set" or "set_ms"
-    :type suffix: str
-    :return: Name of the output this topic is setting
-    :rtype: str
+    :return: Tuple of output name and suffix, or None if this isn't a
+        topic which sets an output
+    :rtype: tuple
     """
-    if not topic.endswith("/%s" % suffix):
-        raise ValueError("This topic does not end with '/%s'" % suffix)
-    lindex = len("%s/%s/" % (topic_prefix, OUTPUT_TOPIC))
-    rindex = -len(suffix) - 1
-    return topic[lindex:rindex]
+    prefix = "%s/%s/" % (topic_prefix, OUTPUT_TOPIC)
+    if not topic.startswith(prefix):
+        return None
+    output_name, _, suffix = topic[len(prefix) :].rpartition("/")
+    if not output_name or suffix not in OUTPUT_TOPIC_HANDLERS:
+        return None
+    return output_name, suffix
+
+
+def parse_output_topic_cached(topic, topic_prefix):
+    """
+    Same as parse_output_topic(), but remembers the result for each topic.
+    The set of topics we receive messages on is small and keeps repeating, so
+    most messages are resolved by a single dict lookup. Topics which aren't
+    output topics are remembered too, so they aren't parsed again either.
+    The cache is keyed on the topic alone, so it must only be used with the
+    one topic prefix we're configured with.
+    :param topic: String such as 'mytopicprefix/output/tv_lamp/set'
+    :type topic: str
+    :param topic_prefix: Prefix of our topics
+    :type topic_prefix: str
+    :return: Tuple of output name and suffix, or None if this isn't a
+        topic which sets an output
+    :rtype: tuple
+    """
+    try:
+        return OUTPUT_TOPIC_CACHE[topic]
+    except KeyError:
+        pass
+    output_topic = parse_output_topic(topic, topic_prefix)
+    OUTPUT_TOPIC_CACHE[topic] = output_topic
+    if len(OUTPUT_TOPIC_CACHE) > OUTPUT_TOPIC_CACHE_SIZE:
+        OUTPUT_TOPIC_CACHE.popitem(last=False)
+    return output_topic
 
 
 def stream_write_name_from_topic(topic, topic_prefix):
@@ -384,8 +554,8 @@ def stream_write_name_from_topic(topic, topic_prefix):
 def init_mqtt(config, digital_outputs, stream_writes):
     """
     Configure MQTT client.
-    :param config: Validated config dict containing MQTT connection details
-    :type config: dict
+    :param config: MQTT connection details
+    :type config: MqttConfig
     :param digital_outputs: List of validated config dicts for digital outputs
     :type digital_outputs: list
     :param stream_writes: List of validated config dicts for stream writes
@@ -394,50 +564,33 @@ def init_mqtt(config, digital_outputs, stream_writes):
     :rtype: paho.mqtt.client.Client
     """
     global topic_prefix
-    topic_prefix = config["topic_prefix"]
+    topic_prefix = config.topic_prefix
     protocol = mqtt.MQTTv311
-    if config["protocol"] == "3.1":
+    if config.protocol == "3.1":
         protocol = mqtt.MQTTv31
 
-    # https://stackoverflow.com/questions/45774538/what-is-the-maximum-length-of-client-id-in-mqtt
-    # TLDR: Soft limit of 23, but we needn't truncate it on our end.
-    client_id = config["client_id"]
-    if not client_id:
-        client_id = "pi-mqtt-gpio-%s" % sha1(topic_prefix.encode("utf8")).hexdigest()
-
-    client = mqtt.Client(client_id=client_id, clean_session=False, protocol=protocol)
+    client = mqtt.Client(
+        client_id=config.client_id, clean_session=False, protocol=protocol
+    )
 
-    if config["user"] and config["password"]:
-        client.username_pw_set(config["user"], config["password"])
+    if config.user and config.password:
+        client.username_pw_set(config.user, config.password)
 
     # Set last will and testament (LWT)
-    status_topic = "%s/%s" % (topic_prefix, config["status_topic"])
     client.will_set(
-        status_topic, payload=config["status_payload_dead"], qos=1, retain=True
+        config.status_topic, payload=config.status_payload_dead, qos=1, retain=True
+    )
+    _LOG.debug(
+        "Last will set on %r as %r.", config.status_topic, config.status_payload_dead
     )
-    _LOG.debug("Last will set on %r as %r.", status_topic, config["status_payload_dead"])
 
     # Set TLS options
-    tls_enabled = config.get("tls", {}).get("enabled")
-    if tls_enabled:
-        tls_config = config["tls"]
-        tls_kwargs = dict(
-            ca_certs=tls_config.get("ca_certs"),
-            certfile=tls_config.get("certfile"),
-            keyfile=tls_config.get("keyfile"),
-            ciphers=tls_config.get("ciphers"),
-        )
-        try:
-            tls_kwargs["cert_reqs"] = getattr(ssl, tls_config["cert_reqs"])
-        except KeyError:
-            pass
-        try:
-            tls_kwargs["tls_version"] = getattr(ssl, tls_config["tls_version"])
-        except KeyError:
-            pass
+    if config.tls_kwargs is not None:
+        client.tls_set(**config.tls_kwargs)
+        client.tls_insecure_set(config.tls_insecure)
 
-        client.tls_set(**tls_kwargs)
-        client.tls_insecure_set(tls_config["insecure"])
+    output_topic_prefix = "%s/%s/" % (topic_prefix, OUTPUT_TOPIC)
+    stream_topic_prefix = "%s/%s/" % (topic_prefix, STREAM_TOPIC)
 
     def on_conn(client, userdata, flags, rc):
         """
@@ -454,31 +607,27 @@ def init_mqtt(config, digital_outputs, stream_writes):
         """
         if rc == 0:
             _LOG.info(
-                "Connected to the MQTT broker with protocol v%s.", config["protocol"]
+                "Connected to the MQTT broker with protocol v%s.", config.protocol
             )
+            set_tcp_nodelay(client)
+            # Subscribe to exactly the topics we handle, all in one request
+            topics = []
             for out_conf in digital_outputs:
                 for suffix in (SET_TOPIC, SET_ON_MS_TOPIC, SET_OFF_MS_TOPIC):
-                    topic = "%s/%s/%s/%s" % (
-                        topic_prefix,
-                        OUTPUT_TOPIC,
-                        out_conf["name"],
-                        suffix,
-                    )
-                    client.subscribe(topic, qos=1)
-                    _LOG.info("Subscribed to topic: %r", topic)
+                    topics.append("%s/%s" % (out_conf["state_topic"], suffix))
             for stream_write_conf in stream_writes:
-                topic = "%s/%s/%s" % (
-                    topic_prefix,
-                    STREAM_TOPIC,
-                    stream_write_conf["name"],
+                topics.append(
+                    "%s/%s/%s" % (topic_prefix, STREAM_TOPIC, stream_write_conf["name"])
                 )
-                client.subscribe(topic, qos=1)
-                _LOG.info("Subscribed to topic: %r", topic)
+            if topics:
+                client.subscribe([(topic, 1) for topic in topics])
+                for topic in topics:
+                    _LOG.info("Subscribed to topic: %r", topic)
             client.publish(
-                status_topic, config["status_payload_running"], qos=1, retain=True
+                config.status_topic, config.status_payload_running, qos=1, retain=True
             )
             # HASS
-            if config["discovery"]:
+            if config.discovery:
                 for in_conf in digital_inputs:
                     hass_announce_digital_input(in_conf, topic_prefix, config)
                 for out_conf in digital_outputs:
@@ -512,26 +661,24 @@ def init_mqtt(config, digital_outputs, stream_writes):
         :rtype: NoneType
         """
         try:
-            topic_type = type_from_topic(msg.topic, topic_prefix)
-            _LOG.info(
-                "Received message on topic %r type: %r: %r",
-                msg.topic,
-                topic_type,
-                msg.payload,
-            )
-            if topic_type == OUTPUT_TOPIC:
-                if msg.topic.endswith("/%s" % SET_TOPIC):
-                    handle_set(topic_prefix, msg)
-                elif msg.topic.endswith("/%s" % SET_ON_MS_TOPIC):
-                    handle_set_ms(topic_prefix, msg, True)
-                elif msg.topic.endswith("/%s" % SET_OFF_MS_TOPIC):
-                    handle_set_ms(topic_prefix, msg, False)
-                else:
-                    _LOG.warning("Unhandled output topic %r.", msg.topic)
-            elif topic_type == STREAM_TOPIC:
+            if _LOG.isEnabledFor(logging.INFO):
+                _LOG.info(
+                    "Received message on topic %r: %r",
+                    msg.topic,
+                    msg.payload.decode("utf8", "replace"),
+                )
+            # Cheap prefix checks first, so that anything else is rejected
+            # without being parsed or cached.
+            if msg.topic.startswith(output_topic_prefix):
+                output_topic = parse_output_topic_cached(msg.topic, topic_prefix)
+                if output_topic is not None:
+                    output_name, suffix = output_topic
+                    OUTPUT_TOPIC_HANDLERS[suffix](topic_prefix, msg, output_name)
+                    return
+            elif msg.topic.startswith(stream_topic_prefix):
                 handle_raw(topic_prefix, msg)
-            else:
-                _LOG.warning("Unhandled topic %r.", msg.topic)
+                return
+            _LOG.warning("Unhandled topic %r.", msg.topic)
         except InvalidPayload as exc:
             _LOG.warning("Invalid payload on received MQTT message: %s" % exc)
         except Exception:
@@ -895,6 +1042,44 @@ def stream_timer_thread(STREAM_MODULES, stream_reads, topic_prefix):
         sleep(max(0, next_call - time()))
 
 
+def write_outputs(module, pending):
+    """
+    Applies a batch of queued writes to the outputs of a gpio module, in order.
+    A write which is immediately followed by an identical one is skipped.
+    :param module: Name of the gpio module
+    :type module: str
+    :param pending: List of (output, value) tuples as returned by get_all()
+    :type pending: list
+    :return: None
+    :rtype: NoneType
+    """
+    for write, next_write in zip(pending, pending[1:] + [None]):
+        output_config, value = write
+        if next_write is not None and next_write[0] is output_config:
+            if next_write[1] == value:
+                continue
+        try:
+            write_output(output_config, value)
+        except Exception:
+            _LOG.exception(
+                "output_writer_thread: failed to set output %r on module %r:",
+                output_config.name,
+                module,
+            )
+
+
+def output_writer_thread(module, queue):
+    """
+    Writer thread for the outputs of a gpio module
+    Setting a pin may be a slow bus transaction (e.g. I2C on an IO expander),
+    so it's done here instead of holding up the MQTT client's network thread.
+    Each module has its own thread, so writes to different modules overlap,
+    while writes to the same module stay in the order they were received.
+    """
+    while True:
+        write_outputs(module, queue.get_all())
+
+
 def gpio_interrupt_callback(module, pin):
     try:
         in_conf = GPIO_INTERRUPT_LOOKUP[module][pin]
@@ -910,43 +1095,95 @@ def gpio_interrupt_callback(module, pin):
 
     # publish the interrupt trigger
     client.publish(
-        "%s/%s/%s" % (topic_prefix, INPUT_TOPIC, in_conf["name"]),
+        in_conf["state_topic"],
         payload=in_conf["interrupt_payload"],
+        qos=in_conf["qos"],
         retain=in_conf["retain"],
     )
 
 
+def poll_inputs(polled_inputs, input_groups):
+    """
+    Reads the polled inputs and returns the ones whose state has changed.
+    Every pin is read twice to debounce it, but all of the pins share the same
+    debounce delay instead of each one sleeping in turn.
+    :param polled_inputs: Inputs in the order get_pins() returns their states
+    :type polled_inputs: list
+    :param input_groups: List of tuples as returned by group_inputs_by_module()
+    :type input_groups: list
+    :return: List of (input, new state) tuples
+    :rtype: list
+    """
+    if not polled_inputs:
+        return []
+    states = get_pins(input_groups)
+    sleep(0.01)
+    changed_inputs = []
+    debounced_states = get_pins(input_groups)
+    for in_conf, state, debounced in zip(polled_inputs, states, debounced_states):
+        if debounced != state:
+            continue
+        if state != LAST_STATES[in_conf.name]:
+            _LOG.info("Polling: Input %r state changed to %r", in_conf.name, state)
+            changed_inputs.append((in_conf, state))
+            LAST_STATES[in_conf.name] = state
+    return changed_inputs
+
+
+def publish_input_states(changed_inputs):
+    """
+    Publishes the new states of the inputs which changed during a polling pass.
+    The messages are queued back to back so that the MQTT network thread can
+    write them out together instead of waking up for each one.
+    :param changed_inputs: List of (input, new state) tuples
+    :type changed_inputs: list
+    :return: None
+    :rtype: NoneType
+    """
+    for in_conf, state in changed_inputs:
+        client.publish(
+            in_conf.state_topic,
+            payload=in_conf.on_payload if state else in_conf.off_payload,
+            qos=in_conf.qos,
+            retain=in_conf.retain,
+        )
+
+
 def hass_announce_digital_input(in_conf, topic_prefix, mqtt_config):
     """
     Announces digital input as binary_sensor to HomeAssistant.
     :param in_conf: Input config
     :type in_conf: dict
+    :param topic_prefix: Prefix of our topics
+    :type topic_prefix: str
+    :param mqtt_config: MQTT config
+    :type mqtt_config: MqttConfig
     :return: None
     :rtype: NoneType
     """
     device_id = (
-        "pi-mqtt-gpio-%s" % sha1(topic_prefix.encode("utf8")).hexdigest()[:8]
+        "pi-mqtt-gpio-%s" % topic_prefix_digest(topic_prefix)[:8]
     )  # TODO: Unify with MQTT Client ID
     sensor_name = in_conf["name"]
     sensor_config = {
         "name": sensor_name,
         "unique_id": "%s_%s_input_%s" % (device_id, in_conf["module"], sensor_name),
-        "state_topic": "%s/%s/%s" % (topic_prefix, INPUT_TOPIC, in_conf["name"]),
-        "availability_topic": "%s/%s" % (topic_prefix, mqtt_config["status_topic"]),
-        "payload_available": mqtt_config["status_payload_running"],
-        "payload_not_available": mqtt_config["status_payload_dead"],
+        "state_topic": in_conf["state_topic"],
+        "availability_topic": mqtt_config.status_topic,
+        "payload_available": mqtt_config.status_payload_running,
+        "payload_not_available": mqtt_config.status_payload_dead,
         "payload_on": in_conf["on_payload"],
         "payload_off": in_conf["off_payload"],
         "device": {
             "manufacturer": "MQTT GPIO",
             "identifiers": ["mqtt-gpio", device_id],
-            "name": mqtt_config["discovery_name"],
+            "name": mqtt_config.discovery_name,
         },
     }
 
     client.publish(
         "%s/%s/%s/%s/config"
-        % (mqtt_config["discovery_prefix"], "binary_sensor", device_id, sensor_name),
+        % (mqtt_config.discovery_prefix, "binary_sensor", device_id, sensor_name),
         payload=json.dumps(sensor_config),
         retain=True,
     )
@@ -957,34 +1194,37 @@ def hass_announce_digital_output(out_conf, topic_prefix, mqtt_config):
     Announces digital output as switch to HomeAssistant.
     :param out_conf: Output config
     :type out_conf: dict
+    :param topic_prefix: Prefix of our topics
+    :type topic_prefix: str
+    :param mqtt_config: MQTT config
+    :type mqtt_config: MqttConfig
     :return: None
     :rtype: NoneType
     """
     device_id = (
-        "pi-mqtt-gpio-%s" % sha1(topic_prefix.encode("utf8")).hexdigest()[:8]
+        "pi-mqtt-gpio-%s" % topic_prefix_digest(topic_prefix)[:8]
     )  # TODO: Unify with MQTT Client ID
     sensor_name = out_conf["name"]
     sensor_config = {
         "name": sensor_name,
         "unique_id": "%s_%s_output_%s" % (device_id, out_conf["module"], sensor_name),
-        "state_topic": "%s/%s/%s" % (topic_prefix, OUTPUT_TOPIC, out_conf["name"]),
-        "command_topic": "%s/%s/%s/%s"
-        % (topic_prefix, OUTPUT_TOPIC, out_conf["name"], SET_TOPIC),
-        "availability_topic": "%s/%s" % (topic_prefix, mqtt_config["status_topic"]),
-        "payload_available": mqtt_config["status_payload_running"],
-        "payload_not_available": mqtt_config["status_payload_dead"],
+        "state_topic": out_conf["state_topic"],
+        "command_topic": "%s/%s" % (out_conf["state_topic"], SET_TOPIC),
+        "availability_topic": mqtt_config.status_topic,
+        "payload_available": mqtt_config.status_payload_running,
+        "payload_not_available": mqtt_config.status_payload_dead,
         "payload_on": out_conf["on_payload"],
         "payload_off": out_conf["off_payload"],
         "device": {
             "manufacturer": "MQTT GPIO",
             "identifiers": ["mqtt-gpio", device_id],
-            "name": mqtt_config["discovery_name"],
+            "name": mqtt_config.discovery_name,
         },
     }
 
     client.publish(
         "%s/%s/%s/%s/config"
-        % (mqtt_config["discovery_prefix"], "switch", device_id, sensor_name),
+        % (mqtt_config.discovery_prefix, "switch", device_id, sensor_name),
         payload=json.dumps(sensor_config),
         retain=True,
     )
@@ -1019,8 +1259,9 @@ def main(args):
     stream_reads = config["stream_reads"]
     stream_writes = config["stream_writes"]
 
-    client = init_mqtt(config["mqtt"], config["digital_outputs"], config["stream_writes"])
-    topic_prefix = config["mqtt"]["topic_prefix"]
+    mqtt_config = MqttConfig.from_config(config["mqtt"])
+    client = init_mqtt(mqtt_config, config["digital_outputs"], config["stream_writes"])
+    topic_prefix = mqtt_config.topic_prefix
 
     # Install modules for GPIOs
     for gpio_config in config["gpio_modules"]:
@@ -1064,12 +1305,28 @@ def main(args):
             )
             sys.exit(1)
 
+    # Work out the topics the pin states are published on once, rather than
+    # every time a state is published.
     for in_conf in digital_inputs:
+        in_conf["state_topic"] = "%s/%s/%s" % (
+            topic_prefix,
+            INPUT_TOPIC,
+            in_conf["name"],
+        )
         initialise_digital_input(in_conf, GPIO_MODULES[in_conf["module"]])
         LAST_STATES[in_conf["name"]] = None
 
     for out_conf in digital_outputs:
+        out_conf["state_topic"] = "%s/%s/%s" % (
+            topic_prefix,
+            OUTPUT_TOPIC,
+            out_conf["name"],
+        )
         initialise_digital_output(out_conf, GPIO_MODULES[out_conf["module"]])
+        DIGITAL_OUTPUTS[out_conf["name"]] = DigitalOutput.from_config(
+            out_conf, GPIO_MODULES[out_conf["module"]]
+        )
+        OUTPUT_QUEUES.setdefault(out_conf["module"], OutputQueue())
 
     for sens_conf in sensor_inputs:
         try:
@@ -1117,7 +1374,7 @@ def main(args):
         initialise_stream(stream_conf, STREAM_MODULES[stream_conf["module"]])
 
     try:
-        client.connect(config["mqtt"]["host"], config["mqtt"]["port"], 60)
+        client.connect(mqtt_config.host, mqtt_config.port, 60)
     except socket.error as err:
         _LOG.fatal("Unable to connect to MQTT server: %s" % err)
         sys.exit(1)
@@ -1125,6 +1382,15 @@ def main(args):
 
     scheduler = Scheduler()
 
+    # Only poll pins that are not configured as interrupt.
+    polled_inputs, input_groups = group_inputs_by_module(
+        [
+            DigitalInput.from_config(in_conf, GPIO_MODULES[in_conf["module"]])
+            for in_conf in digital_inputs
+            if in_conf["interrupt"] == "none"
+        ]
+    )
+
     try:
         # Starting the sensor thread (if there are sensors configured)
         if sensor_inputs:
@@ -1156,37 +1422,30 @@ def main(args):
             stream_thread.daemon = True
             stream_thread.start()
 
+        # Starting one output writer thread per gpio module with outputs
+        for module, queue in OUTPUT_QUEUES.items():
+            output_thread = threading.Thread(
+                target=output_writer_thread,
+                kwargs={"module": module, "queue": queue},
+            )
+            output_thread.name = "pi-mqtt-gpio_OutputWriter_%s" % module
+            # stops the thread, when main program terminates
+            output_thread.daemon = True
+            output_thread.start()
+
         while True:
-            for in_conf in digital_inputs:
-                # Only read pins that are not configured as interrupt.
-                # Read interrupts once at startup (startup_read)
-                if in_conf["interrupt"] != "none":
-                    continue
-                gpio = GPIO_MODULES[in_conf["module"]]
-                state = get_pin(in_conf, gpio)
-                sleep(0.01)
-                if get_pin(in_conf, gpio) != state:
-                    continue
-                if state != LAST_STATES[in_conf["name"]]:
-                    _LOG.info(
-                        "Polling: Input %r state changed to %r", in_conf["name"], state
-                    )
-                    client.publish(
-                        "%s/%s/%s" % (topic_prefix, INPUT_TOPIC, in_conf["name"]),
-                        payload=(
-                            in_conf["on_payload"] if state else in_conf["off_payload"]
-                        ),
-                        retain=in_conf["retain"],
-                    )
-                    LAST_STATES[in_conf["name"]] = state
+            changed_inputs = poll_inputs(polled_inputs, input_groups)
+            publish_input_states(changed_inputs)
             scheduler.loop()
-            sleep(0.01)
+            # With no inputs to poll there's nothing to do until a scheduled
+            # task is due, so don't keep waking up in the meantime.
+            scheduler.wait(POLL_INTERVAL_SECS if polled_inputs else IDLE_INTERVAL_SECS)
     except KeyboardInterrupt:
         print("")
     finally:
         client.publish(
-            "%s/%s" % (topic_prefix, config["mqtt"]["status_topic"]),
-            config["mqtt"]["status_payload_stopped"],
+            mqtt_config.status_topic,
+            mqtt_config.status_payload_stopped,
             qos=1,
             retain=True,
         )
@@ -23,3 +23,8 @@ def test_stdio_set_pin():
 def test_stdio_get_pin():
     value = gpio.get_pin(5)
     assert value == False
+
+
+def test_stdio_get_pins():
+    values = gpio.get_pins([5, 6])
+    assert values == [False, False]
@@ -0,0 +1,57 @@
+import pytest
+
+from pi_mqtt_gpio.frozen_config import DigitalOutput, MqttConfig
+
+MQTT_CONFIG = {
+    "host": "localhost",
+    "port": 1883,
+    "user": "",
+    "password": "",
+    "client_id": "",
+    "topic_prefix": "home",
+    "protocol": "3.1.1",
+    "status_topic": "status",
+    "status_payload_running": "running",
+    "status_payload_stopped": "stopped",
+    "status_payload_dead": "dead",
+    "discovery": False,
+    "discovery_prefix": "homeassistant",
+    "discovery_name": "MQTT GPIO",
+}
+
+
+def test_mqtt_config_derived_values():
+    config = MqttConfig.from_config(MQTT_CONFIG)
+    assert config.client_id.startswith("pi-mqtt-gpio-")
+    assert config.status_topic == "home/status"
+    assert config.tls_kwargs is None
+
+
+def test_mqtt_config_client_id_configured():
+    config = MqttConfig.from_config(dict(MQTT_CONFIG, client_id="my-client"))
+    assert config.client_id == "my-client"
+
+
+def test_mqtt_config_immutable():
+    config = MqttConfig.from_config(MQTT_CONFIG)
+    with pytest.raises(AttributeError):
+        config.host = "example.com"
+
+
+def test_digital_output_encodes_payloads():
+    output = DigitalOutput.from_config(
+        {
+            "name": "lamp",
+            "module": "stdio",
+            "pin": 1,
+            "inverted": False,
+            "on_payload": "ON",
+            "off_payload": "OFF",
+            "retain": False,
+            "state_topic": "home/output/lamp",
+        },
+        None,
+    )
+    assert output.on_payload_bytes == b"ON"
+    assert output.off_payload_bytes == b"OFF"
+    assert output.timed_set_ms is None
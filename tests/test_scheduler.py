@@ -0,0 +1,53 @@
+from time import time
+
+from pi_mqtt_gpio.scheduler import COMPACT_MIN_SIZE, Scheduler, Task
+
+
+def test_scheduler_runs_due_tasks_in_order():
+    scheduler = Scheduler()
+    ran = []
+    now = time()
+    scheduler.add_task(Task(now - 1, ran.append, "second"))
+    scheduler.add_task(Task(now - 2, ran.append, "first"))
+    scheduler.add_task(Task(now - 1, ran.append, "third"))
+    scheduler.loop()
+    assert ran == ["first", "second", "third"]
+    assert not scheduler.tasks
+
+
+def test_scheduler_keeps_future_tasks():
+    scheduler = Scheduler()
+    ran = []
+    scheduler.add_task(Task(time() + 60, ran.append, "later"))
+    scheduler.add_task(Task(time() - 1, ran.append, "now"))
+    scheduler.loop()
+    assert ran == ["now"]
+    assert len(scheduler.tasks) == 1
+
+
+def test_scheduler_wait_returns_when_task_due():
+    scheduler = Scheduler()
+    scheduler.add_task(Task(time() + 0.05, lambda: None))
+    start = time()
+    scheduler.wait(10)
+    assert time() - start < 1
+
+
+def test_scheduler_skips_cancelled_tasks():
+    scheduler = Scheduler()
+    ran = []
+    task = Task(time() - 1, ran.append, "cancelled")
+    scheduler.add_task(task)
+    task.cancel()
+    scheduler.loop()
+    assert ran == []
+    assert not scheduler.tasks
+
+
+def test_scheduler_compacts_cancelled_tasks():
+    scheduler = Scheduler()
+    for _ in range(COMPACT_MIN_SIZE * 4):
+        task = Task(time() + 60, lambda: None)
+        scheduler.add_task(task)
+        task.cancel()
+    assert len(scheduler.tasks) < COMPACT_MIN_SIZE
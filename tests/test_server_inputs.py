@@ -0,0 +1,71 @@
+from pi_mqtt_gpio import server
+from pi_mqtt_gpio.frozen_config import DigitalInput
+
+
+class FakeGPIO(object):
+    def __init__(self, states):
+        self.states = states
+        self.reads = []
+
+    def get_pins(self, pins):
+        self.reads.append(pins)
+        return [self.states[pin] for pin in pins]
+
+
+def make_input(name, module, gpio, pin, inverted=False):
+    return DigitalInput.from_config(
+        {
+            "name": name,
+            "module": module,
+            "pin": pin,
+            "inverted": inverted,
+            "on_payload": "ON",
+            "off_payload": "OFF",
+            "retain": False,
+            "qos": 0,
+            "state_topic": "home/input/%s" % name,
+        },
+        gpio,
+    )
+
+
+def make_interleaved_inputs():
+    gpio_a = FakeGPIO({1: True, 2: False})
+    gpio_b = FakeGPIO({7: True, 8: False})
+    return [
+        make_input("a1", "a", gpio_a, 1),
+        make_input("b7", "b", gpio_b, 7, inverted=True),
+        make_input("a2", "a", gpio_a, 2),
+        make_input("b8", "b", gpio_b, 8),
+    ]
+
+
+def test_group_inputs_by_module_interleaved():
+    inputs = make_interleaved_inputs()
+    polled_inputs, input_groups = server.group_inputs_by_module(inputs)
+    assert [in_conf.name for in_conf in polled_inputs] == ["a1", "a2", "b7", "b8"]
+    assert [(gpio, pins) for gpio, _, pins in input_groups] == [
+        (inputs[0].gpio, [1, 2]),
+        (inputs[1].gpio, [7, 8]),
+    ]
+
+
+def test_get_pins_one_read_per_module():
+    inputs = make_interleaved_inputs()
+    _, input_groups = server.group_inputs_by_module(inputs)
+    assert server.get_pins(input_groups) == [True, False, False, False]
+    assert inputs[0].gpio.reads == [[1, 2]]
+    assert inputs[1].gpio.reads == [[7, 8]]
+
+
+def test_poll_inputs_returns_changed(monkeypatch):
+    inputs = make_interleaved_inputs()
+    polled_inputs, input_groups = server.group_inputs_by_module(inputs)
+    monkeypatch.setattr(
+        server, "LAST_STATES", {"a1": False, "a2": False, "b7": True, "b8": False}
+    )
+    changed = server.poll_inputs(polled_inputs, input_groups)
+    assert [(in_conf.name, state) for in_conf, state in changed] == [
+        ("a1", True),
+        ("b7", False),
+    ]
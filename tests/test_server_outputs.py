@@ -0,0 +1,124 @@
+import threading
+from time import sleep
+
+import pytest
+
+from pi_mqtt_gpio import server
+from pi_mqtt_gpio.frozen_config import DigitalOutput
+
+
+class FakeGPIO(object):
+    def __init__(self):
+        self.writes = []
+
+    def set_pin(self, pin, value):
+        self.writes.append((pin, value))
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append((topic, payload))
+
+
+def make_output(name, pin, gpio, timed_set_ms=None):
+    return DigitalOutput.from_config(
+        {
+            "name": name,
+            "module": "fake",
+            "pin": pin,
+            "inverted": False,
+            "on_payload": "ON",
+            "off_payload": "OFF",
+            "timed_set_ms": timed_set_ms,
+            "retain": False,
+            "state_topic": "home/output/%s" % name,
+        },
+        gpio,
+    )
+
+
+@pytest.fixture
+def gpio(monkeypatch):
+    monkeypatch.setattr(server, "client", FakeClient(), raising=False)
+    return FakeGPIO()
+
+
+def test_output_queue_wakes_on_put():
+    queue = server.OutputQueue()
+    received = []
+
+    def consume():
+        while len(received) < 3:
+            received.extend(queue.get_all())
+
+    consumer = threading.Thread(target=consume)
+    consumer.daemon = True
+    consumer.start()
+    sleep(0.05)
+    assert consumer.is_alive()
+    for write in ("first", "second", "third"):
+        queue.put(write)
+    consumer.join(5)
+    assert not consumer.is_alive()
+    assert received == ["first", "second", "third"]
+
+
+def test_write_outputs_skips_duplicates(gpio):
+    lamp = make_output("lamp", 1, gpio)
+    fan = make_output("fan", 2, gpio)
+    queue = server.OutputQueue()
+    for write in (
+        (lamp, True),
+        (lamp, True),
+        (fan, True),
+        (lamp, False),
+        (fan, True),
+        (fan, True),
+    ):
+        queue.put(write)
+    server.write_outputs("fake", queue.get_all())
+    assert gpio.writes == [(1, True), (2, True), (1, False), (2, True)]
+    assert server.client.published == [
+        ("home/output/lamp", "ON"),
+        ("home/output/fan", "ON"),
+        ("home/output/lamp", "OFF"),
+        ("home/output/fan", "ON"),
+    ]
+
+
+class FakeMessage(object):
+    def __init__(self, payload):
+        self.payload = payload
+
+
+@pytest.fixture
+def lamp(monkeypatch, gpio):
+    lamp = make_output("lamp", 1, gpio)
+    monkeypatch.setattr(server, "scheduler", server.Scheduler(), raising=False)
+    monkeypatch.setattr(server, "DIGITAL_OUTPUTS", {"lamp": lamp})
+    monkeypatch.setattr(server, "OUTPUT_QUEUES", {"fake": server.OutputQueue()})
+    monkeypatch.setattr(server, "PENDING_REVERTS", {})
+    return lamp
+
+
+def run_scheduler():
+    server.scheduler.loop()
+    return [value for _, value in server.OUTPUT_QUEUES["fake"].get_all()]
+
+
+def test_latest_timed_set_wins(lamp):
+    server.handle_set_ms("home", FakeMessage(b"0"), "lamp", value=True)
+    server.handle_set_ms("home", FakeMessage(b"0"), "lamp", value=False)
+    assert run_scheduler() == [True, False, True]
+    assert not server.scheduler.tasks
+
+
+def test_set_cancels_timed_set(lamp):
+    server.handle_set_ms("home", FakeMessage(b"0"), "lamp", value=True)
+    server.handle_set_ms("home", FakeMessage(b"0"), "lamp", value=False)
+    server.handle_set("home", FakeMessage(b"OFF"), "lamp")
+    assert run_scheduler() == [True, False, False]
+    assert not server.PENDING_REVERTS
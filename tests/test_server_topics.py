@@ -0,0 +1,45 @@
+from pi_mqtt_gpio import server
+
+
+def test_parse_output_topic_set():
+    assert server.parse_output_topic("home/pi/output/lamp/set", "home/pi") == (
+        "lamp",
+        server.SET_TOPIC,
+    )
+
+
+def test_parse_output_topic_set_ms():
+    assert server.parse_output_topic("pi/output/lamp/set_on_ms", "pi") == (
+        "lamp",
+        server.SET_ON_MS_TOPIC,
+    )
+    assert server.parse_output_topic("pi/output/lamp/set_off_ms", "pi") == (
+        "lamp",
+        server.SET_OFF_MS_TOPIC,
+    )
+
+
+def test_parse_output_topic_unknown_suffix():
+    assert server.parse_output_topic("pi/output/lamp/toggle", "pi") is None
+
+
+def test_parse_output_topic_other_prefix():
+    assert server.parse_output_topic("other/output/lamp/set", "pi") is None
+    assert server.parse_output_topic("pi/stream/tx", "pi") is None
+
+
+def test_parse_output_topic_cached():
+    server.OUTPUT_TOPIC_CACHE.clear()
+    topic = "pi/output/lamp/set"
+    assert server.parse_output_topic_cached(topic, "pi") == ("lamp", server.SET_TOPIC)
+    assert server.OUTPUT_TOPIC_CACHE[topic] == ("lamp", server.SET_TOPIC)
+    assert server.parse_output_topic_cached("pi/stream/tx", "pi") is None
+    assert "pi/stream/tx" in server.OUTPUT_TOPIC_CACHE
+
+
+def test_parse_output_topic_cached_bounded(monkeypatch):
+    server.OUTPUT_TOPIC_CACHE.clear()
+    monkeypatch.setattr(server, "OUTPUT_TOPIC_CACHE_SIZE", 2)
+    for name in ("a", "b", "c"):
+        server.parse_output_topic_cached("pi/output/%s/set" % name, "pi")
+    assert list(server.OUTPUT_TOPIC_CACHE) == ["pi/output/b/set", "pi/output/c/set"]
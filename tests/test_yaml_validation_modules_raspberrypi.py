@@ -201,6 +201,21 @@ def test_yaml_validation_modules_raspberrypi_digital_input_retain_no_boolean():
             raise ModuleConfigInvalid(module_validator_input.errors)
 
 
+def test_yaml_validation_modules_raspberrypi_digital_input_qos_optional():
+    digital_inputs["digital_inputs"][0]["qos"] = 1
+    if not module_validator_input.validate(digital_inputs):
+        yaml.dump(module_validator_input.errors)
+        raise ModuleConfigInvalid(module_validator_input.errors)
+
+
+def test_yaml_validation_modules_raspberrypi_digital_input_qos_invalid():
+    digital_inputs["digital_inputs"][0]["qos"] = 3
+    with pytest.raises(ModuleConfigInvalid):
+        if not module_validator_input.validate(digital_inputs):
+            yaml.dump(module_validator_input.errors)
+            raise ModuleConfigInvalid(module_validator_input.errors)
+
+
 def test_yaml_validation_modules_raspberrypi_digital_input_interrupt_empty():
     # setup gpio TEST_RASPBERRYPI_GPIO_SET_GET_OUTPUT as output
     digital_inputs["digital_inputs"][0]["interrupt"] = ""